@@ -5,8 +5,10 @@ MongoDB helper functions ready to use in your backend code.
 Import and use these functions in your API endpoints for database operations.
 """
 
-from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import ConnectionFailure, PyMongoError
 from datetime import datetime, timezone
+import logging
 import os
 from dotenv import load_dotenv
 from typing import Union
@@ -15,6 +17,8 @@ from pydantic import BaseModel
 # Load environment variables from .env file
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 _client = None
 db = None
 
@@ -22,11 +26,11 @@ database_url = os.getenv("DATABASE_URL")
 database_name = os.getenv("DATABASE_NAME")
 
 if database_url and database_name:
-    _client = MongoClient(database_url)
+    _client = AsyncIOMotorClient(database_url)
     db = _client[database_name]
 
 # Helper functions for common database operations
-def create_document(collection_name: str, data: Union[BaseModel, dict]):
+async def create_document(collection_name: str, data: Union[BaseModel, dict]):
     """Insert a single document with timestamp"""
     if db is None:
         raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
@@ -40,10 +44,10 @@ def create_document(collection_name: str, data: Union[BaseModel, dict]):
     data_dict['created_at'] = datetime.now(timezone.utc)
     data_dict['updated_at'] = datetime.now(timezone.utc)
 
-    result = db[collection_name].insert_one(data_dict)
+    result = await db[collection_name].insert_one(data_dict)
     return str(result.inserted_id)
 
-def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None):
+async def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None):
     """Get documents from collection"""
     if db is None:
         raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
@@ -52,4 +56,32 @@ def get_documents(collection_name: str, filter_dict: dict = None, limit: int = N
     if limit:
         cursor = cursor.limit(limit)
     
-    return list(cursor)
+    return await cursor.to_list(length=limit)
+
+async def ensure_indexes():
+    """Create indexes backing the API's filters, sorts and point lookups"""
+    if db is None:
+        return
+
+    indexes = [
+        # Equality (gender, category) -> Sort (_id) -> Range (price)
+        (db.products, [("gender", 1), ("category", 1), ("_id", -1), ("price", 1)], {}),
+        (db.products, [("title", "text"), ("description", "text"), ("tags", "text")], {}),
+        (db.cart, [("user_id", 1), ("product_id", 1)], {"unique": True}),
+        (db.wishlist, [("user_id", 1), ("product_id", 1)], {"unique": True}),
+        (db.orders, [("razorpay_order_id", 1)], {"unique": True}),
+        # webhook idempotency keys, kept for a week to cover Razorpay's retry window
+        (db.webhook_events, [("event_id", 1)], {"unique": True}),
+        (db.webhook_events, [("created_at", 1)], {"expireAfterSeconds": 7 * 24 * 3600}),
+    ]
+    # A missing index only costs performance (product search falls back to a regex scan without
+    # the text index), so failures are logged rather than stopping the app
+    for collection, keys, options in indexes:
+        try:
+            await collection.create_index(keys, **options)
+        except ConnectionFailure as e:
+            logger.warning("Skipping index creation, database unreachable: %s", e)
+            return
+        except PyMongoError as e:
+            # e.g. DuplicateKeyError when existing rows violate a unique index
+            logger.warning("Could not create index %s on %s: %s", keys, collection.name, e)
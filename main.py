@@ -1,34 +1,170 @@
 import os
+import asyncio
 import hmac
 import hashlib
+import logging
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
 from typing import List, Optional
-from fastapi import FastAPI, HTTPException, Query
+import httpx
+import orjson
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, Field, TypeAdapter
 from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError, OperationFailure
 
-from database import db, create_document, get_documents
+from database import db, create_document, get_documents, ensure_indexes
+from schemas import OBJECT_ID_PATTERN, MAX_CART_QUANTITY
 
-app = FastAPI(title="Premium Kids Fashion API")
+# Razorpay credentials, resolved once at import; the secret is pre-encoded for signature checks
+RAZORPAY_KEY_ID = os.getenv("RAZORPAY_KEY_ID")
+RAZORPAY_KEY_SECRET = os.getenv("RAZORPAY_KEY_SECRET")
+RAZORPAY_ENABLED = bool(RAZORPAY_KEY_ID and RAZORPAY_KEY_SECRET)
+KEY_SECRET_BYTES = (RAZORPAY_KEY_SECRET or "mock_secret").encode()
+# Webhook secret configured in the Razorpay dashboard; without it webhooks never fulfil orders
+RAZORPAY_WEBHOOK_SECRET = os.getenv("RAZORPAY_WEBHOOK_SECRET")
+WEBHOOK_SECRET_BYTES = RAZORPAY_WEBHOOK_SECRET.encode() if RAZORPAY_WEBHOOK_SECRET else None
+
+# Comma-separated frontend origins; unset keeps the open wildcard (without credentials) for local dev
+CORS_ORIGINS = [o.strip() for o in os.getenv("CORS_ORIGINS", "").split(",") if o.strip()]
+
+logger = logging.getLogger(__name__)
+
+if not CORS_ORIGINS:
+    logger.warning("CORS_ORIGINS is not set; allowing any origin without credentials")
+
+app = FastAPI(title="Premium Kids Fashion API", default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_origins=CORS_ORIGINS or ["*"],
+    allow_credentials=bool(CORS_ORIGINS),
+    allow_methods=["GET", "POST", "PUT", "DELETE"],
+    allow_headers=["Authorization", "Content-Type", "If-None-Match"],
+    max_age=86400,
 )
 
+# JSON list payloads compress well; skip small bodies where gzip overhead isn't worth it
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
+
+@app.on_event("startup")
+async def on_startup():
+    # one pooled client so Razorpay calls reuse keep-alive TLS connections
+    app.state.http = httpx.AsyncClient(
+        http2=True,
+        timeout=10,
+        limits=httpx.Limits(max_keepalive_connections=20),
+    )
+    # build indexes in the background so a slow or unreachable database doesn't block boot
+    app.state.index_task = asyncio.create_task(ensure_indexes())
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await app.state.http.aclose()
+
 
 # -----------------------------
 # Helper
 # -----------------------------
 
 def to_obj_id(id_str: str) -> ObjectId:
-    try:
-        return ObjectId(id_str)
-    except Exception:
+    # check up front rather than paying for a raised/caught exception on bad input
+    if not ObjectId.is_valid(id_str):
         raise HTTPException(status_code=400, detail="Invalid id")
+    return ObjectId(id_str)
+
+
+# Fields returned by list views; full documents come from the detail endpoints
+# ($project stages; _id is stringified into "id" by the database rather than in Python)
+PRODUCT_LIST_PROJECTION = {
+    "_id": 0,
+    "id": {"$toString": "$_id"},
+    "title": 1,
+    "price": 1,
+    "mrp": 1,
+    "image_urls": {"$slice": ["$image_urls", 1]},
+    "gender": 1,
+    "category": 1,
+    "created_at": 1,
+}
+ORDER_LIST_PROJECTION = {"_id": 0, "items": 0}
+
+# MongoDB's IndexNotFound code, raised by $text queries when the text index doesn't exist
+TEXT_INDEX_NOT_FOUND = 27
+
+
+def with_products_pipeline(user_id: str) -> list:
+    """Aggregation joining a user's cart/wishlist rows to their product card fields"""
+    return [
+        {"$match": {"user_id": user_id}},
+        {"$addFields": {"pid": {"$convert": {"input": "$product_id", "to": "objectId", "onError": None, "onNull": None}}}},
+        {
+            "$lookup": {
+                "from": "products",
+                "localField": "pid",
+                "foreignField": "_id",
+                "as": "product",
+                "pipeline": [
+                    {"$project": {"_id": 0, "title": 1, "price": 1, "image_urls": {"$slice": ["$image_urls", 1]}}},
+                ],
+            }
+        },
+        # keep rows whose product is gone or unparsable (product: null) so clients can show and remove them
+        {"$unwind": {"path": "$product", "preserveNullAndEmptyArrays": True}},
+        {"$addFields": {"id": {"$toString": "$_id"}, "product": {"$ifNull": ["$product", None]}}},
+        {"$project": {"_id": 0, "pid": 0}},
+    ]
+
+
+# In-process TTL/LRU cache for catalog reads: key -> (expires_at, etag, payload)
+PRODUCT_CACHE_TTL = 60
+PRODUCT_CACHE_MAX_ENTRIES = 1024
+_product_cache: "OrderedDict[str, tuple]" = OrderedDict()
+
+
+def cache_get(key: str):
+    hit = _product_cache.get(key)
+    if hit is None:
+        return None
+    if hit[0] < time.monotonic():
+        _product_cache.pop(key, None)
+        return None
+    _product_cache.move_to_end(key)
+    return hit[1], hit[2]
+
+
+def cache_set(key: str, payload: dict) -> str:
+    digest = hashlib.blake2b(orjson.dumps(payload, default=str, option=orjson.OPT_SORT_KEYS), digest_size=16)
+    etag = f'"{digest.hexdigest()}"'
+    _product_cache[key] = (time.monotonic() + PRODUCT_CACHE_TTL, etag, payload)
+    _product_cache.move_to_end(key)
+    while len(_product_cache) > PRODUCT_CACHE_MAX_ENTRIES:
+        _product_cache.popitem(last=False)
+    return etag
+
+
+def invalidate_products_cache():
+    _product_cache.clear()
+
+
+def invalidate_product_cache(product_id: str):
+    _product_cache.pop(f"product:{product_id}", None)
+
+
+def etag_response(request: Request, response: Response, etag: str, payload: dict):
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = f"public, max-age={PRODUCT_CACHE_TTL}"
+    return payload
 
 
 # -----------------------------
@@ -48,20 +184,24 @@ class ProductCreate(BaseModel):
 
 
 class CartItem(BaseModel):
-    user_id: str
-    product_id: str
-    quantity: int = Field(..., ge=1)
+    user_id: str = Field(..., min_length=1, max_length=64)
+    product_id: str = Field(..., pattern=OBJECT_ID_PATTERN)
+    quantity: int = Field(..., ge=1, le=MAX_CART_QUANTITY)
 
 
 class WishlistItem(BaseModel):
-    user_id: str
-    product_id: str
+    user_id: str = Field(..., min_length=1, max_length=64)
+    product_id: str = Field(..., pattern=OBJECT_ID_PATTERN)
 
 
 class OrderCreate(BaseModel):
-    user_id: str
+    user_id: str = Field(..., min_length=1, max_length=64)
     items: List[CartItem]
-    total_price: float
+    total_price: float = Field(..., ge=0, le=10_000_000)
+
+
+# Serializer for order items, built once instead of walking each model per checkout
+CART_ITEMS_ADAPTER = TypeAdapter(List[CartItem])
 
 
 # -----------------------------
@@ -69,12 +209,26 @@ class OrderCreate(BaseModel):
 # -----------------------------
 
 @app.get("/")
-def read_root():
+async def read_root():
     return {"message": "Kids Fashion API running"}
 
 
+# /test?deep=true collection listing, cached as (expires_at, names)
+COLLECTIONS_CACHE_TTL = 30
+_collections_cache: tuple = (0.0, [])
+
+
+async def cached_collection_names() -> List[str]:
+    global _collections_cache
+    expires_at, names = _collections_cache
+    if expires_at < time.monotonic():
+        names = await db.list_collection_names()
+        _collections_cache = (time.monotonic() + COLLECTIONS_CACHE_TTL, names)
+    return names
+
+
 @app.get("/test")
-def test_database():
+async def test_database(deep: bool = Query(default=False)):
     response = {
         "backend": "✅ Running",
         "database": "❌ Not Available",
@@ -87,10 +241,11 @@ def test_database():
             response["database"] = "✅ Connected"
             response["database_url"] = "✅ Set"
             response["database_name"] = db.name
-            response["collections"] = db.list_collection_names()
+            if deep:
+                response["collections"] = await cached_collection_names()
     except Exception as e:
         response["database"] = f"❌ Error: {str(e)[:80]}"
-    response["razorpay_key_id"] = "✅ Set" if os.getenv("RAZORPAY_KEY_ID") else "❌ Not Set"
+    response["razorpay_key_id"] = "✅ Set" if RAZORPAY_KEY_ID else "❌ Not Set"
     return response
 
 
@@ -99,13 +254,22 @@ def test_database():
 # -----------------------------
 
 @app.get("/api/products")
-def list_products(
+async def list_products(
+    request: Request,
+    response: Response,
     gender: Optional[str] = Query(default=None),
     category: Optional[str] = Query(default=None),
     min_price: Optional[float] = Query(default=None),
     max_price: Optional[float] = Query(default=None),
     q: Optional[str] = Query(default=None),
+    limit: int = Query(default=24, ge=1, le=100),
+    cursor: Optional[str] = Query(default=None),
 ):
+    cache_key = f"products:{gender}:{category}:{min_price}:{max_price}:{q}:{limit}:{cursor}"
+    cached = cache_get(cache_key)
+    if cached:
+        return etag_response(request, response, *cached)
+
     filt = {}
     if gender:
         filt["gender"] = gender
@@ -118,34 +282,68 @@ def list_products(
         if max_price is not None:
             price_query["$lte"] = float(max_price)
         filt["price"] = price_query
-    if q:
-        filt["title"] = {"$regex": q, "$options": "i"}
-    items = list(db.products.find(filt).sort("created_at", -1))
-    for it in items:
-        it["id"] = str(it.pop("_id"))
-    return {"items": items}
+
+    async def run(match: dict, sort: dict) -> list:
+        pipeline = [
+            {"$match": match},
+            {"$sort": sort},
+            {"$limit": limit},
+            {"$project": PRODUCT_LIST_PROJECTION},
+        ]
+        return await db.products.aggregate(pipeline).to_list(length=limit)
+
+    items = None
+    if q and not cursor:
+        # relevance-ranked $text results are a single page
+        try:
+            items = await run({**filt, "$text": {"$search": q}}, {"score": {"$meta": "textScore"}, "_id": -1})
+        except OperationFailure as e:
+            if e.code != TEXT_INDEX_NOT_FOUND:
+                raise
+            logger.warning("Text index missing, falling back to regex product search")
+        # $text only matches whole stemmed words; partial words like "shi" fall through to the regex
+        items = items or None
+    text_search = items is not None
+    if items is None:
+        # newest first on _id so the sort key matches the _id < cursor keyset filter
+        match = dict(filt)
+        if q:
+            match["title"] = {"$regex": re.escape(q), "$options": "i"}
+        if cursor:
+            match["_id"] = {"$lt": to_obj_id(cursor)}
+        items = await run(match, {"_id": -1})
+    next_cursor = items[-1]["id"] if len(items) == limit and not text_search else None
+    payload = {"items": items, "next_cursor": next_cursor}
+    return etag_response(request, response, cache_set(cache_key, payload), payload)
 
 
 @app.get("/api/products/{product_id}")
-def get_product(product_id: str):
-    doc = db.products.find_one({"_id": to_obj_id(product_id)})
+async def get_product(product_id: str, request: Request, response: Response):
+    cache_key = f"product:{product_id}"
+    cached = cache_get(cache_key)
+    if cached:
+        return etag_response(request, response, *cached)
+
+    doc = await db.products.find_one({"_id": to_obj_id(product_id)})
     if not doc:
         raise HTTPException(status_code=404, detail="Product not found")
     doc["id"] = str(doc.pop("_id"))
-    return doc
+    return etag_response(request, response, cache_set(cache_key, doc), doc)
 
 
 @app.post("/api/products")
-def create_product(payload: ProductCreate):
-    pid = create_document("products", payload.model_dump())
+async def create_product(payload: ProductCreate):
+    pid = await create_document("products", payload.model_dump())
+    invalidate_products_cache()
     return {"id": pid}
 
 
 @app.delete("/api/products/{product_id}")
-def delete_product(product_id: str):
-    res = db.products.delete_one({"_id": to_obj_id(product_id)})
+async def delete_product(product_id: str):
+    res = await db.products.delete_one({"_id": to_obj_id(product_id)})
     if res.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Product not found")
+    invalidate_products_cache()
     return {"ok": True}
 
 
@@ -154,26 +352,28 @@ def delete_product(product_id: str):
 # -----------------------------
 
 @app.get("/api/wishlist")
-def get_wishlist(user_id: str):
-    items = list(db.wishlist.find({"user_id": user_id}))
-    for it in items:
-        it["id"] = str(it.pop("_id"))
+async def get_wishlist(user_id: str):
+    items = await db.wishlist.aggregate(with_products_pipeline(user_id)).to_list(length=None)
     return {"items": items}
 
 
 @app.post("/api/wishlist")
-def add_wishlist(item: WishlistItem):
-    # prevent duplicates
-    existing = db.wishlist.find_one({"user_id": item.user_id, "product_id": item.product_id})
-    if existing:
-        return {"id": str(existing["_id"])}
-    wid = create_document("wishlist", item.model_dump())
-    return {"id": wid}
+async def add_wishlist(item: WishlistItem):
+    # upsert keeps a single row per (user_id, product_id)
+    now = datetime.now(timezone.utc)
+    doc = await db.wishlist.find_one_and_update(
+        {"user_id": item.user_id, "product_id": item.product_id},
+        {"$setOnInsert": {**item.model_dump(), "created_at": now, "updated_at": now}},
+        upsert=True,
+        projection={"_id": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    return {"id": str(doc["_id"])}
 
 
 @app.delete("/api/wishlist")
-def remove_wishlist(user_id: str, product_id: str):
-    res = db.wishlist.delete_one({"user_id": user_id, "product_id": product_id})
+async def remove_wishlist(user_id: str, product_id: str):
+    res = await db.wishlist.delete_one({"user_id": user_id, "product_id": product_id})
     return {"deleted": res.deleted_count > 0}
 
 
@@ -182,34 +382,44 @@ def remove_wishlist(user_id: str, product_id: str):
 # -----------------------------
 
 @app.get("/api/cart")
-def get_cart(user_id: str):
-    items = list(db.cart.find({"user_id": user_id}))
-    for it in items:
-        it["id"] = str(it.pop("_id"))
+async def get_cart(user_id: str):
+    items = await db.cart.aggregate(with_products_pipeline(user_id)).to_list(length=None)
     return {"items": items}
 
 
 @app.post("/api/cart")
-def add_to_cart(item: CartItem):
-    existing = db.cart.find_one({"user_id": item.user_id, "product_id": item.product_id})
-    if existing:
-        db.cart.update_one({"_id": existing["_id"]}, {"$inc": {"quantity": item.quantity}})
-        return {"id": str(existing["_id"]), "quantity": existing.get("quantity", 0) + item.quantity}
-    cid = create_document("cart", item.model_dump())
-    return {"id": cid}
+async def add_to_cart(item: CartItem):
+    now = datetime.now(timezone.utc)
+    # pipeline update so the stored quantity is capped, not just each request's increment
+    doc = await db.cart.find_one_and_update(
+        {"user_id": item.user_id, "product_id": item.product_id},
+        [
+            {
+                "$set": {
+                    "quantity": {"$min": [{"$add": [{"$ifNull": ["$quantity", 0]}, item.quantity]}, MAX_CART_QUANTITY]},
+                    "created_at": {"$ifNull": ["$created_at", now]},
+                    "updated_at": now,
+                }
+            }
+        ],
+        upsert=True,
+        projection={"_id": 1, "quantity": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    return {"id": str(doc["_id"]), "quantity": doc["quantity"]}
 
 
 @app.put("/api/cart")
-def update_cart(item: CartItem):
-    res = db.cart.update_one({"user_id": item.user_id, "product_id": item.product_id}, {"$set": {"quantity": item.quantity}})
+async def update_cart(item: CartItem):
+    res = await db.cart.update_one({"user_id": item.user_id, "product_id": item.product_id}, {"$set": {"quantity": item.quantity}})
     if res.matched_count == 0:
         raise HTTPException(status_code=404, detail="Cart item not found")
     return {"ok": True}
 
 
 @app.delete("/api/cart")
-def remove_from_cart(user_id: str, product_id: str):
-    res = db.cart.delete_one({"user_id": user_id, "product_id": product_id})
+async def remove_from_cart(user_id: str, product_id: str):
+    res = await db.cart.delete_one({"user_id": user_id, "product_id": product_id})
     return {"deleted": res.deleted_count > 0}
 
 
@@ -217,55 +427,104 @@ def remove_from_cart(user_id: str, product_id: str):
 # Orders + Razorpay
 # -----------------------------
 
-@app.post("/api/payment/create-order")
-def create_payment_order(order: OrderCreate):
-    key_id = os.getenv("RAZORPAY_KEY_ID")
-    key_secret = os.getenv("RAZORPAY_KEY_SECRET")
-
-    # amount in paise
-    amount_paise = int(round(order.total_price * 100))
-
-    # If keys present, create order via Razorpay API
-    if key_id and key_secret:
-        import requests
-        payload = {"amount": amount_paise, "currency": "INR", "receipt": f"rcpt_{order.user_id}"}
-        resp = requests.post(
-            "https://api.razorpay.com/v1/orders",
-            auth=(key_id, key_secret),
-            json=payload,
-            timeout=10,
-        )
-        if resp.status_code >= 300:
-            raise HTTPException(status_code=resp.status_code, detail=resp.text)
-        data = resp.json()
-        # save order minimally
-        create_document(
-            "orders",
+# Razorpay payment statuses that mean the money was taken
+PAID_STATUSES = {"paid", "captured"}
+
+
+async def save_order(order: OrderCreate, razorpay_order_id: Optional[str]):
+    """Insert a pending order; stock and cart are only touched once payment is confirmed"""
+    now = datetime.now(timezone.utc)
+    try:
+        await db.orders.insert_one(
             {
                 "user_id": order.user_id,
-                "items": [i.model_dump() for i in order.items],
+                "items": CART_ITEMS_ADAPTER.dump_python(order.items),
                 "total_price": order.total_price,
                 "payment_status": "pending",
                 "shipping_status": "pending",
-                "razorpay_order_id": data.get("id"),
-            },
+                "razorpay_order_id": razorpay_order_id,
+                "created_at": now,
+                "updated_at": now,
+            }
+        )
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="Order already exists")
+
+
+async def fulfil_order(razorpay_order_id: str):
+    """Decrement stock and clear the ordered cart rows for a paid order, once it succeeds"""
+    now = datetime.now(timezone.utc)
+    # claiming fulfilled_at makes repeated confirmations (verify + webhook, retries) no-ops
+    order = await db.orders.find_one_and_update(
+        {"razorpay_order_id": razorpay_order_id, "fulfilled_at": {"$exists": False}},
+        {"$set": {"fulfilled_at": now, "updated_at": now}},
+        projection={"user_id": 1, "items": 1},
+    )
+    if not order:
+        return
+    # orders stored before product ids were validated may hold ids that aren't ObjectIds
+    items = [i for i in order.get("items", []) if ObjectId.is_valid(i.get("product_id"))]
+    if not items:
+        return
+    # the stock guard keeps stock from going negative; a short match is flagged for the admin
+    stock_ops = [
+        UpdateOne(
+            {"_id": ObjectId(i["product_id"]), "stock": {"$gte": i["quantity"]}},
+            {"$inc": {"stock": -i["quantity"]}, "$set": {"updated_at": now}},
         )
-        return {"order": data, "key_id": key_id}
+        for i in items
+    ]
+    product_ids = [i["product_id"] for i in items]
+    try:
+        # stock and cart live in different collections, so both writes go out concurrently
+        stock_res, _ = await asyncio.gather(
+            db.products.bulk_write(stock_ops, ordered=False),
+            db.cart.delete_many({"user_id": order["user_id"], "product_id": {"$in": product_ids}}),
+        )
+    except Exception:
+        # release the claim so a retried verify/webhook can fulfil the order
+        await db.orders.update_one({"_id": order["_id"]}, {"$unset": {"fulfilled_at": ""}})
+        raise
+    for pid in product_ids:
+        invalidate_product_cache(pid)
+    if stock_res.matched_count < len(stock_ops):
+        logger.warning("Insufficient stock while fulfilling order %s", razorpay_order_id)
+        await db.orders.update_one({"_id": order["_id"]}, {"$set": {"stock_shortfall": True}})
+
+
+def amount_in_paise(order: OrderCreate) -> int:
+    return int(round(order.total_price * 100))
+
+
+async def _live_create_payment_order(order: OrderCreate):
+    payload = {"amount": amount_in_paise(order), "currency": "INR", "receipt": f"rcpt_{order.user_id}"}
+    resp = await app.state.http.post(
+        "https://api.razorpay.com/v1/orders",
+        auth=(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET),
+        json=payload,
+    )
+    if resp.status_code >= 300:
+        raise HTTPException(status_code=resp.status_code, detail=resp.text)
+    data = resp.json()
+    await save_order(order, data.get("id"))
+    return {"order": data, "key_id": RAZORPAY_KEY_ID}
 
+
+async def _mock_create_payment_order(order: OrderCreate):
     # Fallback mock (for local without keys)
     mock_id = f"order_{ObjectId()}"
-    create_document(
-        "orders",
-        {
-            "user_id": order.user_id,
-            "items": [i.model_dump() for i in order.items],
-            "total_price": order.total_price,
-            "payment_status": "pending",
-            "shipping_status": "pending",
-            "razorpay_order_id": mock_id,
-        },
-    )
-    return {"order": {"id": mock_id, "amount": amount_paise, "currency": "INR"}, "key_id": "rzp_test_mock"}
+    await save_order(order, mock_id)
+    return {"order": {"id": mock_id, "amount": amount_in_paise(order), "currency": "INR"}, "key_id": "rzp_test_mock"}
+
+
+# Live vs mock mode is fixed by the environment, so pick the handler once at import;
+# the explicit name/summary/operation_id keep the OpenAPI schema the same in both modes
+create_payment_order = app.post(
+    "/api/payment/create-order",
+    name="create_payment_order",
+    summary="Create Payment Order",
+    operation_id="create_payment_order_api_payment_create_order_post",
+)(_live_create_payment_order if RAZORPAY_ENABLED else _mock_create_payment_order)
 
 
 class VerifyPayload(BaseModel):
@@ -275,38 +534,64 @@ class VerifyPayload(BaseModel):
 
 
 @app.post("/api/payment/verify")
-def verify_payment(body: VerifyPayload):
-    key_secret = os.getenv("RAZORPAY_KEY_SECRET")
+async def verify_payment(body: VerifyPayload):
     generated = hmac.new(
-        (key_secret or "mock_secret").encode(),
+        KEY_SECRET_BYTES,
         f"{body.razorpay_order_id}|{body.razorpay_payment_id}".encode(),
         hashlib.sha256,
     ).hexdigest()
 
-    is_valid = generated == body.razorpay_signature if key_secret else True
+    # constant-time compare so the signature check does not leak timing
+    is_valid = hmac.compare_digest(generated.encode(), body.razorpay_signature.encode()) if RAZORPAY_KEY_SECRET else True
 
     status = "paid" if is_valid else "failed"
-    db.orders.update_one(
+    await db.orders.update_one(
         {"razorpay_order_id": body.razorpay_order_id},
         {"$set": {"payment_status": status, "razorpay_payment_id": body.razorpay_payment_id}},
     )
     if not is_valid:
         raise HTTPException(status_code=400, detail="Invalid signature")
+    await fulfil_order(body.razorpay_order_id)
     return {"ok": True}
 
 
 @app.post("/api/payment/webhook")
-async def payment_webhook(payload: dict):
+async def payment_webhook(payload: dict, request: Request):
     # Minimal webhook handler: update order status when event received
+    signed = False
+    if WEBHOOK_SECRET_BYTES:
+        # Razorpay signs the raw body with the webhook secret; reject anything that doesn't match
+        expected = hmac.new(WEBHOOK_SECRET_BYTES, await request.body(), hashlib.sha256).hexdigest()
+        signature = request.headers.get("x-razorpay-signature", "")
+        if not hmac.compare_digest(expected.encode(), signature.encode()):
+            raise HTTPException(status_code=400, detail="Invalid signature")
+        signed = True
+    event_id = request.headers.get("x-razorpay-event-id") or payload.get("id")
+    if event_id:
+        # Razorpay retries deliveries; record each event once and ignore repeats
+        try:
+            await db.webhook_events.insert_one({"event_id": event_id, "created_at": datetime.now(timezone.utc)})
+        except DuplicateKeyError:
+            return {"received": True, "dup": True}
     event = payload.get("event")
     entity = payload.get("payload", {}).get("payment", {}).get("entity", {})
     order_id = entity.get("order_id")
-    status = entity.get("status")
-    if order_id:
-        db.orders.update_one(
-            {"razorpay_order_id": order_id},
-            {"$set": {"payment_status": status or "processing"}},
-        )
+    status = entity.get("status") or "processing"
+    try:
+        if order_id:
+            # the $ne guard turns an unchanged status into a no-op instead of a write
+            await db.orders.update_one(
+                {"razorpay_order_id": order_id, "payment_status": {"$ne": status}},
+                {"$set": {"payment_status": status}},
+            )
+            # only an authenticated webhook may take stock and clear carts; otherwise verify_payment does
+            if signed and status in PAID_STATUSES:
+                await fulfil_order(order_id)
+    except Exception:
+        # un-mark the event so Razorpay's retry is processed instead of reported as a duplicate
+        if event_id:
+            await db.webhook_events.delete_one({"event_id": event_id})
+        raise
     return {"received": True}
 
 
@@ -315,15 +600,48 @@ async def payment_webhook(payload: dict):
 # -----------------------------
 
 @app.get("/api/orders")
-def list_orders():
-    items = list(db.orders.find().sort("created_at", -1))
-    for it in items:
-        it["id"] = str(it.pop("_id"))
-    return {"items": items}
+async def list_orders(
+    limit: int = Query(default=50, ge=1, le=200),
+    cursor: Optional[str] = Query(default=None),
+):
+    filt = {}
+    if cursor:
+        filt["_id"] = {"$lt": to_obj_id(cursor)}
+    # ObjectIds grow with insertion time, so newest-first on _id is an index-backed keyset scan
+    pipeline = [
+        {"$match": filt},
+        {"$sort": {"_id": -1}},
+        {"$limit": limit},
+        {"$addFields": {"id": {"$toString": "$_id"}}},
+        {"$project": ORDER_LIST_PROJECTION},
+    ]
+
+    async def stream():
+        # encode each order as it arrives from the driver instead of materializing the page
+        count, last_id = 0, None
+        yield b'{"items":['
+        async for doc in db.orders.aggregate(pipeline):
+            if count:
+                yield b","
+            count, last_id = count + 1, doc["id"]
+            yield orjson.dumps(doc, default=str)
+        next_cursor = last_id if count == limit else None
+        yield b'],"next_cursor":' + orjson.dumps(next_cursor) + b"}"
+
+    return StreamingResponse(stream(), media_type="application/json")
+
+
+@app.get("/api/orders/{order_id}")
+async def get_order(order_id: str):
+    doc = await db.orders.find_one({"_id": to_obj_id(order_id)})
+    if not doc:
+        raise HTTPException(status_code=404, detail="Order not found")
+    doc["id"] = str(doc.pop("_id"))
+    return doc
 
 
 @app.put("/api/orders/{order_id}")
-def update_order(order_id: str, payment_status: Optional[str] = None, shipping_status: Optional[str] = None):
+async def update_order(order_id: str, payment_status: Optional[str] = None, shipping_status: Optional[str] = None):
     update = {}
     if payment_status:
         update["payment_status"] = payment_status
@@ -331,7 +649,7 @@ def update_order(order_id: str, payment_status: Optional[str] = None, shipping_s
         update["shipping_status"] = shipping_status
     if not update:
         raise HTTPException(status_code=400, detail="No fields to update")
-    res = db.orders.update_one({"_id": to_obj_id(order_id)}, {"$set": update})
+    res = await db.orders.update_one({"_id": to_obj_id(order_id)}, {"$set": update})
     if res.matched_count == 0:
         raise HTTPException(status_code=404, detail="Order not found")
     return {"ok": True}
@@ -340,4 +658,5 @@ def update_order(order_id: str, payment_status: Optional[str] = None, shipping_s
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    workers = int(os.getenv("WEB_CONCURRENCY", max(2, os.cpu_count() or 1)))
+    uvicorn.run("main:app", host="0.0.0.0", port=port, loop="uvloop", http="httptools", workers=workers)
@@ -27,21 +27,25 @@ class Products(BaseModel):
     image_urls: List[str] = []
 
 
+OBJECT_ID_PATTERN = r"^[0-9a-fA-F]{24}$"
+MAX_CART_QUANTITY = 999
+
+
 class Wishlist(BaseModel):
-    user_id: str
-    product_id: str
+    user_id: str = Field(..., min_length=1, max_length=64)
+    product_id: str = Field(..., pattern=OBJECT_ID_PATTERN)
 
 
 class Cart(BaseModel):
-    user_id: str
-    product_id: str
-    quantity: int = Field(..., ge=1)
+    user_id: str = Field(..., min_length=1, max_length=64)
+    product_id: str = Field(..., pattern=OBJECT_ID_PATTERN)
+    quantity: int = Field(..., ge=1, le=MAX_CART_QUANTITY)
 
 
 class Orders(BaseModel):
-    user_id: str
+    user_id: str = Field(..., min_length=1, max_length=64)
     items: List[dict]
-    total_price: float = Field(..., ge=0)
+    total_price: float = Field(..., ge=0, le=10_000_000)
     payment_status: Literal["pending", "paid", "failed", "refunded"] = "pending"
     shipping_status: Literal["pending", "processing", "shipped", "delivered", "cancelled"] = "pending"
     razorpay_payment_id: Optional[str] = None
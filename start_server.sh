@@ -15,5 +15,10 @@ mkdir -p logs
 echo "Installing dependencies..."
 pip install -r requirements.txt
 echo "Starting FastAPI server..."
-nohup uvicorn main:app --host 0.0.0.0 --port 8000 --reload > logs/server.log 2>&1 
+# Set CORS_ORIGINS (comma-separated) to the frontend origin(s); without it
+# cross-origin requests are allowed but credentials/cookies are not.
+if [ -z "$CORS_ORIGINS" ]; then
+  echo "Warning: CORS_ORIGINS is not set; cross-origin requests with credentials will be rejected"
+fi
+nohup uvicorn main:app --host 0.0.0.0 --port 8000 --loop uvloop --http httptools --reload > logs/server.log 2>&1 
 echo "Server started in background"